@@ -34,16 +34,110 @@ To run this app you’ll need to install the dependencies listed in
 `requirements.txt` and then execute `streamlit run app.py` from a terminal.
 """
 
+import hashlib
 import json
-import statistics
-from typing import Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
 import folium
 
+# Shared HTTP session so the TCP/TLS connection to the CBS API is set up once
+# and reused across calls, with retries for transient failures and gzip to
+# shrink the (highly repetitive) JSON responses on the wire.
+SESSION = requests.Session()
+SESSION.headers.update({"Accept-Encoding": "gzip", "Accept": "application/json"})
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        ),
+    ),
+)
 
-def get_emission_data(period: str = "2023JJ00") -> Dict[str, Dict[str, float]]:
+
+# On-disk cache for fetched CBS data, keyed by period.  Annual figures are
+# immutable once the year has ended, so those periods can be served from disk
+# forever — which also keeps the app working offline.
+DATA_CACHE_DIR = Path(".cache/cbs")
+
+# On-disk cache for rendered map HTML.  Unlike `st.cache_data` it survives
+# Streamlit reruns and worker restarts; only the most recent renders are kept.
+MAP_CACHE_DIR = Path("assets")
+MAP_CACHE_KEEP = 8
+
+# Column order of the emission-value arrays returned by `get_emission_data`
+# and consumed by `create_map` and `interpret_data`.
+CATEGORY_ORDER = ("total", "CO2", "other")
+
+# OData keys for emission categories
+CATEGORIES = {
+    "total": "T001372",   # total greenhouse gases
+    "CO2": "A044109",     # carbon dioxide
+    "other": "A050122",   # other greenhouse gases (CH₄, N₂O and F‑gases)
+}
+
+# Reverse lookup from OData emission key to the value-array column, used to
+# dispatch the rows of the combined response in a single pass.
+KEY_TO_COLUMN = {CATEGORIES[name]: i for i, name in enumerate(CATEGORY_ORDER)}
+
+# Mapping of climate sector codes to descriptive names
+SECTORS = {
+    "A050123": "Industrie",             # Industry【597134015243035†L10-L16】
+    "A050124": "Elektriciteit",         # Electricity generation【597134015243035†L18-L22】
+    "A050125": "Mobiliteit",            # Mobility (transport)【597134015243035†L24-L27】
+    "A050126": "Landbouw",               # Agriculture【597134015243035†L29-L31】
+    "A050127": "Gebouwde omgeving",      # Built environment【597134015243035†L33-L38】
+    "A052138": "Landgebruik",            # Land use (LULUCF)【597134015243035†L40-L49】
+}
+
+# Approximate coordinates for each sector to map emissions to locations.
+# Five decimals (~1 m) is ample precision for sector-level markers and keeps
+# the generated map HTML that little bit smaller.
+SECTOR_COORDS = {
+    "Industrie": (51.91086, 4.47858),          # Port of Rotterdam (industry)
+    "Elektriciteit": (53.415, 6.83),         # Eemshaven (electricity)
+    "Mobiliteit": (52.37022, 4.89517),       # Amsterdam (mobility hub)
+    "Landbouw": (52.75, 5.3),                # Rural centre (agriculture)
+    "Gebouwde omgeving": (52.09074, 5.12142), # Utrecht (built environment)
+    "Landgebruik": (52.9896, 6.5649),        # Drenthe/forest area (land use)
+}
+
+# Periods offered in the dropdown.  We list a few of the most recent periods
+# manually; in production you could query the `Perioden` endpoint instead.
+PERIODS = ("2025KW01", "2024KW04", "2024JJ00", "2023JJ00", "2022JJ00")
+
+
+def _is_completed_year(period: str) -> bool:
+    """Whether `period` is an annual code for a year that has fully elapsed.
+
+    CBS annual figures (e.g. "2022JJ00") no longer change once the year is
+    complete, so those periods are safe to serve from the on-disk cache
+    without ever revalidating against the API.
+    """
+    if not period.endswith("JJ00"):
+        return False
+    try:
+        return int(period[:4]) < date.today().year
+    except ValueError:
+        return False
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_emission_data(period: str = "2023JJ00") -> Tuple[List[str], np.ndarray]:
     """Fetch emission data from CBS OData API for a given period.
 
     The CBS table `84979NED` provides quarterly and annual greenhouse‑gas
@@ -58,64 +152,127 @@ def get_emission_data(period: str = "2023JJ00") -> Dict[str, Dict[str, float]]:
             be retrieved from the `Perioden` endpoint of the CBS API【130989130530488†L40-L63】.
 
     Returns:
-        A dictionary keyed by human‑readable sector name containing a nested
-        dictionary of emission categories ("total", "CO2" and "other") and
-        their values in Mt CO₂‑equivalent.
+        A tuple of the human‑readable sector names and an array of shape
+        `(n_sectors, 3)` with one column per emission category in
+        `CATEGORY_ORDER` ("total", "CO2" and "other"), in Mt CO₂‑equivalent.
+        The array form lets downstream code compute averages and
+        above‑average masks in single vectorized operations rather than
+        per‑sector Python loops.
+
+    Results are cached for an hour per period, so Streamlit reruns that keep
+    the same period selection do not hit the network again.  Completed annual
+    periods are additionally persisted under `DATA_CACHE_DIR` and served from
+    disk on later calls, avoiding the network entirely; a corrupt or missing
+    cache file simply triggers a fresh fetch.
+
+    Raises:
+        requests.RequestException: If no data could be fetched at all.
+            Failures are raised rather than returned so `st.cache_data` does
+            not cache the empty result for the full TTL.
     """
+    cache_path = DATA_CACHE_DIR / f"{period}.json"
+    if _is_completed_year(period):
+        try:
+            cached = orjson.loads(cache_path.read_bytes())
+            values = np.asarray(cached["values"], dtype=float)
+            return list(cached["sectors"]), values.reshape(-1, len(CATEGORY_ORDER))
+        except (OSError, ValueError, KeyError):
+            pass
     base_url = "https://opendata.cbs.nl/ODataApi/odata/84979NED"
-    # OData keys for emission categories
-    categories = {
-        "total": "T001372",   # total greenhouse gases
-        "CO2": "A044109",     # carbon dioxide
-        "other": "A050122",   # other greenhouse gases (CH₄, N₂O and F‑gases)
-    }
-    # Mapping of climate sector codes to descriptive names
-    sectors = {
-        "A050123": "Industrie",             # Industry【597134015243035†L10-L16】
-        "A050124": "Elektriciteit",         # Electricity generation【597134015243035†L18-L22】
-        "A050125": "Mobiliteit",            # Mobility (transport)【597134015243035†L24-L27】
-        "A050126": "Landbouw",               # Agriculture【597134015243035†L29-L31】
-        "A050127": "Gebouwde omgeving",      # Built environment【597134015243035†L33-L38】
-        "A052138": "Landgebruik",            # Land use (LULUCF)【597134015243035†L40-L49】
-    }
-    results: Dict[str, Dict[str, float]] = {}
-    for category_name, category_key in categories.items():
-        # Build OData query: filter on period and emission category, select only the
-        # relevant fields and request JSON output.  See example query results【188970336999570†L0-L25】.
+
+    def _fetch_rows(filter_expr: str) -> List[dict]:
         query = (
             f"{base_url}/TypedDataSet?"
-            f"$filter=(Perioden%20eq%20'{period}')%20and%20(Emissies%20eq%20'{category_key}')"
-            "&$select=Klimaatsector,EmissieBroeikasgassen_1&$format=json"
+            f"$filter={filter_expr}"
+            "&$select=Klimaatsector,Emissies,EmissieBroeikasgassen_1&$format=json"
         )
+        response = SESSION.get(query, timeout=(3.0, 10.0))
+        response.raise_for_status()
+        # orjson parses the raw bytes several times faster than the stdlib
+        # json module that response.json() would use.
+        return orjson.loads(response.content).get("value", [])
+
+    # Build a single OData query covering all three emission categories at
+    # once: one round-trip instead of three.  `Emissies` is added to the
+    # selection so each row can be attributed to its category afterwards.
+    # See example query results【188970336999570†L0-L25】.
+    in_filter = (
+        f"(Perioden%20eq%20'{period}')%20and%20"
+        f"(Emissies%20in%20({','.join(repr(k) for k in CATEGORIES.values())}))"
+    )
+    # Whether every category request succeeded; partial results must never be
+    # written to the immutable completed-year cache below.
+    fetch_complete = True
+    fetch_error: Optional[Exception] = None
+    try:
+        data = _fetch_rows(in_filter)
+    except (requests.RequestException, ValueError):
+        # Some OData servers predate the `in` operator.  Fall back to one
+        # request per category, fired concurrently: the iterations are
+        # independent and purely I/O-bound, so the wall-clock cost is that of
+        # the slowest request rather than the sum of all three.
+        data = []
+        with ThreadPoolExecutor(max_workers=len(CATEGORIES)) as executor:
+            futures = [
+                executor.submit(
+                    _fetch_rows,
+                    f"(Perioden%20eq%20'{period}')%20and%20(Emissies%20eq%20'{key}')",
+                )
+                for key in CATEGORIES.values()
+            ]
+            for future in as_completed(futures):
+                try:
+                    data.extend(future.result())
+                except (requests.RequestException, ValueError) as exc:
+                    # If the API cannot be reached (e.g. due to network
+                    # restrictions), skip this category; the app will still
+                    # load with whatever data did arrive.
+                    fetch_complete = False
+                    fetch_error = exc
+                    continue
+    if not data and fetch_error is not None:
+        # Every request failed.  Raise instead of returning an empty result:
+        # st.cache_data does not cache exceptions, so the next rerun retries
+        # immediately rather than pinning "no data" for the cache TTL.
+        raise fetch_error
+    # Dispatch the combined response straight into the value rows in a single
+    # pass: each row is placed by sector (row index) and emission key (column).
+    sector_names: List[str] = []
+    row_index: Dict[str, int] = {}
+    rows: List[List[float]] = []
+    for item in data:
+        sector_key = item.get("Klimaatsector")
+        # Skip the total row
+        if sector_key == "T001616":
+            continue
+        column = KEY_TO_COLUMN.get(item.get("Emissies"))
+        if column is None:
+            continue
+        sector_name = SECTORS.get(sector_key, sector_key)
+        i = row_index.get(sector_name)
+        if i is None:
+            i = row_index[sector_name] = len(sector_names)
+            sector_names.append(sector_name)
+            rows.append([0.0] * len(CATEGORY_ORDER))
+        rows[i][column] = item.get("EmissieBroeikasgassen_1", 0.0)
+    values = np.asarray(rows, dtype=float).reshape(
+        len(sector_names), len(CATEGORY_ORDER)
+    )
+    if sector_names and fetch_complete and _is_completed_year(period):
         try:
-            response = requests.get(query)
-            response.raise_for_status()
-            data = response.json().get("value", [])
-        except Exception:
-            # If the API cannot be reached (e.g. due to network restrictions),
-            # fallback to an empty list.  The app will still load with no data.
-            data = []
-        for item in data:
-            sector_key = item.get("Klimaatsector")
-            # Skip the total row
-            if sector_key == "T001616":
-                continue
-            sector_name = sectors.get(sector_key, sector_key)
-            results.setdefault(sector_name, {})[category_name] = item.get(
-                "EmissieBroeikasgassen_1", 0.0
+            DATA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            cache_path.write_bytes(
+                orjson.dumps({"sectors": sector_names, "values": values.tolist()})
             )
-    return results
-
-
-def compute_average(data: Dict[str, Dict[str, float]], category: str) -> float:
-    """Compute the mean emissions across sectors for a given category."""
-    values = [vals.get(category, 0.0) for vals in data.values()]
-    return statistics.mean(values) if values else 0.0
+        except OSError:
+            pass
+    return sector_names, values
 
 
 def create_map(
-    data: Dict[str, Dict[str, float]],
-    averages: Dict[str, float],
+    sector_names: List[str],
+    values: np.ndarray,
+    averages: np.ndarray,
     sector_coords: Dict[str, Tuple[float, float]],
 ) -> folium.Map:
     """Create a folium map with markers for each climate sector.
@@ -124,21 +281,31 @@ def create_map(
     the average are green.  Each marker displays a popup with emissions broken
     down by category.
     """
-    # Centre of the Netherlands
-    m = folium.Map(location=[52.2, 5.3], zoom_start=7, tiles="CartoDB positron")
-    for sector, values in data.items():
+    # Centre of the Netherlands.  `prefer_canvas` makes Leaflet draw the
+    # circle markers onto a single canvas instead of one SVG node each, which
+    # keeps client-side rendering flat in the number of markers.
+    m = folium.Map(
+        location=[52.2, 5.3],
+        zoom_start=7,
+        tiles="CartoDB positron",
+        prefer_canvas=True,
+    )
+    # One vectorized comparison instead of a per-sector test in the loop
+    above_average = values[:, 0] > averages[0]
+    for i, sector in enumerate(sector_names):
         coord = sector_coords.get(sector)
         if not coord:
             continue
-        total_emission = values.get("total", 0.0)
-        marker_color = "green" if total_emission <= averages.get("total", 0.0) else "red"
-        # Build HTML popup with category breakdown
+        total_emission, co2, other = values[i]
+        marker_color = "red" if above_average[i] else "green"
+        # Build HTML popup with category breakdown; a single %-format avoids
+        # the intermediate strings of chained f-string concatenation.
         popup_html = (
-            f"<b>{sector}</b><br>"
-            f"Totale uitstoot: {total_emission:.1f} Mt CO₂-eq<br>"
-            f"CO₂: {values.get('CO2', 0.0):.1f} Mt<br>"
-            f"Overige gassen: {values.get('other', 0.0):.1f} Mt"
-        )
+            "<b>%s</b><br>"
+            "Totale uitstoot: %.1f Mt CO₂-eq<br>"
+            "CO₂: %.1f Mt<br>"
+            "Overige gassen: %.1f Mt"
+        ) % (sector, total_emission, co2, other)
         folium.CircleMarker(
             location=coord,
             radius=10,
@@ -146,13 +313,71 @@ def create_map(
             fill=True,
             fill_color=marker_color,
             fill_opacity=0.7,
-            popup=folium.Popup(popup_html, max_width=300),
+            popup=popup_html,
         ).add_to(m)
     return m
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def render_map_html(
+    sector_names: List[str],
+    values: np.ndarray,
+    averages: np.ndarray,
+    sector_coords: Dict[str, Tuple[float, float]],
+) -> str:
+    """Render the sector map to an HTML string, cached on its inputs.
+
+    Serializing the folium map is the most expensive step of a rerun: it
+    re-runs the whole Jinja template tree.  Caching the resulting string means
+    reruns that do not change the underlying data skip both map construction
+    and HTML generation.  `get_root().render()` is used rather than
+    `_repr_html_()` because it skips the iframe wrapper that
+    `st.components.v1.html` already provides.
+
+    The rendered HTML is additionally persisted under `MAP_CACHE_DIR`, keyed
+    by a content hash of the inputs, so a restarted worker can serve a
+    previously rendered map from disk instead of re-rendering it.  Disk
+    failures fall back to rendering; a corrupt or missing cache is never an
+    error.
+    """
+    digest = hashlib.blake2b(
+        json.dumps(
+            {
+                "sectors": sector_names,
+                "values": values.tolist(),
+                "averages": averages.tolist(),
+                "coords": sector_coords,
+            },
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()[:12]
+    cache_path = MAP_CACHE_DIR / f"map_{digest}.html"
+    try:
+        if cache_path.exists():
+            return cache_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+    m = create_map(sector_names, values, averages, sector_coords)
+    html = m.get_root().render()
+    try:
+        MAP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(html, encoding="utf-8")
+        # Keep only the most recently used renders on disk
+        cached = sorted(
+            MAP_CACHE_DIR.glob("map_*.html"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for stale in cached[MAP_CACHE_KEEP:]:
+            stale.unlink()
+    except OSError:
+        pass
+    return html
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
 def interpret_data(
-    data: Dict[str, Dict[str, float]], averages: Dict[str, float]
+    sector_names: List[str], values: np.ndarray, averages: np.ndarray
 ) -> Dict[str, str]:
     """Generate action items for sectors emitting above the average.
 
@@ -161,20 +386,28 @@ def interpret_data(
         values.
     """
     actions: Dict[str, str] = {}
-    for sector, vals in data.items():
-        total = vals.get("total", 0.0)
-        if total > averages.get("total", 0.0):
-            actions[sector] = (
-                f"De sector {sector} stoot {total:.1f} Mt CO₂-equivalent uit, wat boven "
-                f"het gemiddelde van {averages['total']:.1f} Mt ligt. Controleer grote \
-                installaties en voer aanvullende reductiemaatregelen uit."
-            )
+    # Filter before formatting: the Python loop only touches the sectors that
+    # actually exceed the average.
+    avg_total = averages[0]
+    above_average = np.nonzero(values[:, 0] > avg_total)[0]
+    for i in above_average:
+        sector = sector_names[i]
+        total = values[i, 0]
+        actions[sector] = (
+            f"De sector {sector} stoot {total:.1f} Mt CO₂-equivalent uit, wat boven "
+            f"het gemiddelde van {avg_total:.1f} Mt ligt. Controleer grote \
+            installaties en voer aanvullende reductiemaatregelen uit."
+        )
     return actions
 
 
 def main() -> None:
     """Streamlit entry point."""
-    st.set_page_config(page_title="NL Emissie Dashboard", layout="wide")
+    st.set_page_config(
+        page_title="NL Emissie Dashboard",
+        layout="wide",
+        initial_sidebar_state="collapsed",
+    )
     st.title("Nederlandse broeikasgasuitstoot per klimaatsector")
 
     st.markdown(
@@ -186,51 +419,49 @@ def main() -> None:
         """
     )
 
-    # Select period.  We list a few of the most recent periods manually; in
-    # production you could query the `Perioden` endpoint to populate this.
-    period = st.selectbox(
-        "Kies periode", [
-            "2025KW01", "2024KW04", "2024JJ00", "2023JJ00", "2022JJ00"
-        ], index=2
-    )
-    data = get_emission_data(period)
-    averages = {
-        cat: compute_average(data, cat) for cat in ["total", "CO2", "other"]
-    }
-    # Approximate coordinates for each sector to map emissions to locations
-    sector_coords = {
-        "Industrie": (51.91086, 4.47858),          # Port of Rotterdam (industry)
-        "Elektriciteit": (53.415, 6.83),         # Eemshaven (electricity)
-        "Mobiliteit": (52.370216, 4.895168),     # Amsterdam (mobility hub)
-        "Landbouw": (52.75, 5.3),                # Rural centre (agriculture)
-        "Gebouwde omgeving": (52.09074, 5.12142), # Utrecht (built environment)
-        "Landgebruik": (52.9896, 6.5649),        # Drenthe/forest area (land use)
-    }
-    # Create and display the map
-    if data:
-        map_obj = create_map(data, averages, sector_coords)
-        st.components.v1.html(map_obj._repr_html_(), height=600, scrolling=False)
-    else:
+    # Select period
+    period = st.selectbox("Kies periode", PERIODS, index=2)
+    try:
+        with st.spinner("Gegevens worden opgehaald…"):
+            sector_names, values = get_emission_data(period)
+    except (requests.RequestException, ValueError):
+        sector_names, values = [], np.empty((0, len(CATEGORY_ORDER)))
+    if not sector_names:
+        # Nothing to average, interpret or map — bail out early.
         st.warning(
             "Kon geen data ophalen van de CBS API. Controleer uw internetverbinding of API‑toegang."
         )
+        return
+    # One vectorized pass over the (n_sectors, 3) array yields all three
+    # category averages at once.
+    averages = values.mean(axis=0)
 
+    # The lightweight summary renders first, so the user sees numbers while
+    # the (heavier) map render is still in flight.
     st.subheader("Gemiddelde uitstoot per sector")
     st.write(
         {
-            "Totale gassen": f"{averages['total']:.1f} Mt",
-            "CO₂": f"{averages['CO2']:.1f} Mt",
-            "Overige gassen": f"{averages['other']:.1f} Mt",
+            "Totale gassen": f"{averages[0]:.1f} Mt",
+            "CO₂": f"{averages[1]:.1f} Mt",
+            "Overige gassen": f"{averages[2]:.1f} Mt",
         }
     )
     st.subheader("Actiepunten voor toezichthouders")
-    actions = interpret_data(data, averages)
+    actions = interpret_data(sector_names, values, averages)
     if actions:
         for sector, action in actions.items():
             st.write(f"- {action}")
     else:
         st.write("Geen sectoren boven het gemiddelde voor deze periode.")
 
+    # Create and display the map.  The checkbox lets users skip the map render
+    # entirely when they only need the numbers.
+    st.checkbox("Toon kaart", value=True, key="show_map")
+    if st.session_state.get("show_map", True):
+        with st.spinner("Kaart wordt geladen…"):
+            map_html = render_map_html(sector_names, values, averages, SECTOR_COORDS)
+        st.components.v1.html(map_html, height=600, scrolling=False)
+
 
 if __name__ == "__main__":
     main()